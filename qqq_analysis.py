@@ -1,21 +1,37 @@
-import pandas as pd
+import os
+from datetime import date
 
-# 1. Load QQQ price data generated in Task 2
-df = pd.read_csv("task-2/data/QQQ.csv")
-
-# 2. Convert date column to datetime and set as index
-df["date"] = pd.to_datetime(df["date"])
-df = df.set_index("date")
-df = df.sort_index()
-
-# 3. Filter data between 2015-01-01 and 2025-01-01
-df = df.loc["2015-01-01":"2025-01-01"]
+import numpy as np
+import polars as pl
+from numba import njit
 
-# 4. Forward-fill missing values
-df = df.ffill()
+QQQ_CSV_PATH = "task-2/data/QQQ.csv"
+QQQ_PARQUET_PATH = "task-2/data/QQQ.parquet"
 
-# 5. Compute daily returns
-df["return"] = df["close"].pct_change()
+# 1. Load QQQ price data generated in Task 2
+#    (Parquet if fetch_data.py wrote one: dates are already typed there).
+#    A Parquet file older than the CSV is stale (e.g. CSV updated by git pull).
+use_parquet = os.path.exists(QQQ_PARQUET_PATH) and (
+    not os.path.exists(QQQ_CSV_PATH)
+    or os.path.getmtime(QQQ_PARQUET_PATH) >= os.path.getmtime(QQQ_CSV_PATH)
+)
+if use_parquet:
+    lf = pl.scan_parquet(QQQ_PARQUET_PATH).with_columns(pl.col("date").cast(pl.Date))
+else:
+    lf = pl.scan_csv(QQQ_CSV_PATH).with_columns(pl.col("date").str.to_date())
+
+# 2-5. One lazy Polars plan, executed once at collect():
+#   filter 2015-01-01..2025-01-01 -> sort -> forward-fill -> daily returns
+lf = (
+    lf
+    .filter(pl.col("date").is_between(date(2015, 1, 1), date(2025, 1, 1)))
+    .sort("date")
+    .with_columns(pl.all().forward_fill())
+    .with_columns(pl.col("close").pct_change().alias("return"))
+)
+
+# Downstream strategies use pandas (resample, DatetimeIndex), so convert here
+df = lf.collect().to_pandas().set_index("date")
 
 print("Number of rows:", len(df))
 print(df.head())
@@ -30,16 +46,15 @@ def strategy_dca(df, monthly_invest=1000):
     Dollar-Cost Averaging strategy:
     Invest a fixed amount at the end of each month.
     """
-    df_month = df.resample("ME").last()  # Month-end prices
-
-    total_cost = 0
-    total_shares = 0
+    # Month-end prices: last trading day of each calendar month
+    months = df.index.to_numpy().astype("datetime64[M]")
+    last_idx = np.r_[np.nonzero(np.diff(months))[0], len(months) - 1]
+    month_end_prices = df["close"].to_numpy(dtype=np.float64)[last_idx]
 
-    for _, row in df_month.iterrows():
-        price = row["close"]
-        shares = monthly_invest / price
-        total_cost += monthly_invest
-        total_shares += shares
+    # Buy monthly_invest worth of shares at every month-end close
+    n = month_end_prices.size
+    total_shares = (monthly_invest / month_end_prices).sum()
+    total_cost = monthly_invest * n
 
     # Final portfolio value at the last available close
     final_value = total_shares * df["close"].iloc[-1]
@@ -52,7 +67,7 @@ def strategy_dca(df, monthly_invest=1000):
         "profit": profit,
         "roi": roi,
         "shares": total_shares,
-        "months": len(df_month)
+        "months": n
     }
 
 
@@ -66,33 +81,76 @@ for k, v in dca_result.items():
 # ============================
 # Performance Metrics
 # ============================
+@njit(cache=True)
+def _performance_kernel(returns, initial_capital):
+    """
+    Single pass over daily returns:
+    equity curve -> running max -> max drawdown, plus running mean / variance
+    (Welford) of the returns.
+    Returns (final_equity, max_drawdown, mean, std) with std using ddof=1.
+    Same kernel as task-3/qqq_ta_momentum_compare.py (standalone scripts).
+    """
+    equity = initial_capital
+    max_equity = initial_capital
+    max_dd = 0.0
+    mean = 0.0
+    m2 = 0.0
+    n = 0
+
+    for r in returns:
+        equity *= 1.0 + r
+        if equity > max_equity:
+            max_equity = equity
+        dd = equity / max_equity - 1.0
+        if dd < max_dd:
+            max_dd = dd
+
+        n += 1
+        delta = r - mean
+        mean += delta / n
+        m2 += delta * (r - mean)
+
+    std = np.sqrt(m2 / (n - 1)) if n > 1 else np.nan
+    return equity, max_dd, mean, std
+
+
 def max_drawdown(equity):
     """
-    Compute maximum drawdown.
+    Compute maximum drawdown (NaN values are skipped, like pandas).
     """
-    rolling_max = equity.cummax()
-    drawdown = equity / rolling_max - 1.0
-    return drawdown.min()
+    eq = equity.dropna().to_numpy(dtype=np.float64)
+    if eq.size == 0:
+        return np.nan
+    return (eq / np.maximum.accumulate(eq) - 1.0).min()
 
 
 def annualized_volatility(returns, periods_per_year=252):
     """
     Annualized volatility = std(returns) * sqrt(252)
     """
-    return returns.std() * (periods_per_year ** 0.5)
+    r = returns.dropna().to_numpy(dtype=np.float64)
+    _, _, _, std = _performance_kernel(r, 1.0)
+    return std * (periods_per_year ** 0.5)
 
 
 def sharpe_ratio(returns, rf=0.0, periods_per_year=252):
     """
-    Annualized Sharpe ratio (rf = 0 by default).
+    Annualized Sharpe ratio (rf = 0 by default); nan if returns have no variance.
     """
-    excess_return = returns - rf / periods_per_year
-    return excess_return.mean() / excess_return.std() * (periods_per_year ** 0.5)
+    excess_return = returns.dropna().to_numpy(dtype=np.float64) - rf / periods_per_year
+    _, _, mean, std = _performance_kernel(excess_return, 1.0)
+    return mean / std * (periods_per_year ** 0.5) if std > 0 else np.nan
 
 
 # Buy & Hold baseline (initial capital = $100,000)
 initial_capital = 100_000
-df["bh_equity"] = (1 + df["return"].fillna(0)).cumprod() * initial_capital
+# One float64 buffer: NaN -> 0, then 1 + r, cumprod and scale in place.
+# nan_to_num copies, so df["return"] itself keeps its leading NaN.
+buf = np.nan_to_num(df["return"].to_numpy(dtype=np.float64))
+buf += 1.0
+np.cumprod(buf, out=buf)
+buf *= initial_capital
+df["bh_equity"] = buf
 
 bh_returns = df["return"].dropna()
 bh_mdd = max_drawdown(df["bh_equity"])
@@ -108,6 +166,43 @@ print("Sharpe (rf=0):", bh_sharpe)
 # ============================
 # Strategy 2: Momentum Strategy
 # ============================
+@njit(cache=True)
+def _momentum_kernel(close, lookback, initial_capital):
+    """
+    Single pass over close prices:
+    rolling MA (running sum) -> signal -> daily strategy return -> equity.
+    """
+    n = close.shape[0]
+    strategy_return = np.zeros(n)
+    strategy_equity = np.empty(n)
+
+    running_sum = 0.0
+    pos_prev = 0.0
+    equity = initial_capital
+
+    for i in range(n):
+        # 1. Rolling sum: add today's close, drop the one that left the window
+        running_sum += close[i]
+        if i >= lookback:
+            running_sum -= close[i - lookback]
+
+        # 2. Use previous day's position to avoid lookahead bias
+        if i > 0:
+            ret = close[i] / close[i - 1] - 1.0
+            strategy_return[i] = pos_prev * ret
+            equity *= 1.0 + pos_prev * ret
+        strategy_equity[i] = equity
+
+        # 3. Position for tomorrow: 1 = long, 0 = cash
+        pos_prev = 0.0
+        if i >= lookback - 1:
+            ma = running_sum / lookback
+            if close[i] > ma:
+                pos_prev = 1.0
+
+    return strategy_return, strategy_equity
+
+
 def strategy_momentum(df, lookback=50, initial_capital=100_000):
     """
     Simple momentum strategy:
@@ -116,19 +211,13 @@ def strategy_momentum(df, lookback=50, initial_capital=100_000):
     """
     s = df.copy()
 
-    # 1. Compute moving average
-    s["ma"] = s["close"].rolling(lookback).mean()
-
-    # 2. Position: 1 = long, 0 = cash
-    s["position"] = 0
-    s.loc[s["close"] > s["ma"], "position"] = 1
-
-    # 3. Use previous day's position to avoid lookahead bias
-    s["strategy_return"] = s["position"].shift(1) * s["return"]
-    s["strategy_return"] = s["strategy_return"].fillna(0)
+    close = s["close"].to_numpy(dtype=np.float64)
+    strategy_return, strategy_equity = _momentum_kernel(
+        close, lookback, float(initial_capital)
+    )
 
-    # 4. Equity curve
-    s["strategy_equity"] = (1 + s["strategy_return"]).cumprod() * initial_capital
+    s["strategy_return"] = strategy_return
+    s["strategy_equity"] = strategy_equity
 
     return s
 
@@ -1,13 +1,33 @@
 # task-2/fetch_data.py
 import os
-from datetime import datetime
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+
 import pandas as pd
+import polars as pl
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 START_DATE = "2014-01-01"
 END_DATE = "2024-01-01"
 DATE_FORMAT = "%Y-%m-%d"
 TICKERS = ["QQQ", "TQQQ"]
+# 本地 CSV 在该时间内视为有效，不再重复下载（历史日线不会变）
+CACHE_TTL_SECONDS = 24 * 60 * 60
+# 首/末交易日与区间端点允许的最大间隔（周末 + 节假日）
+CACHE_EDGE_SLACK = pd.Timedelta(days=7)
+
+# 所有 ticker 共用一个 Session（连接池复用），供多线程并发下载
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
 
 def fetch_with_yfinance_strict(ticker: str, start: str, end: str, max_retries: int = 3) -> pd.DataFrame:
 
@@ -17,28 +37,19 @@ def fetch_with_yfinance_strict(ticker: str, start: str, end: str, max_retries: i
     for _ in range(max_retries):
         try:
 
-            df = yf.Ticker(ticker).history(start=start, end=end, auto_adjust=True)
+            df = yf.Ticker(ticker, session=SESSION).history(start=start, end=end, auto_adjust=True)
             if isinstance(df, pd.Series):
                 df = df.to_frame().T
             if df is None or df.empty:
                 raise RuntimeError("empty dataframe from yfinance")
 
 
-            df = df.copy()
             df.index = pd.to_datetime(df.index)
             df = df.sort_index()
 
-
-            keep = ["Open", "Close", "High", "Low", "Volume"]
-            df = df[keep]
-
-            out = pd.DataFrame({
-                "open": df["Open"],
-                "close": df["Close"],
-                "high": df["High"],
-                "low": df["Low"],
-                "volume": df["Volume"].astype("int64", errors="ignore"),
-            })
+            # yfinance 每次返回新的 DataFrame，直接改列名即可，无需 copy
+            keep = ["open", "close", "high", "low", "volume"]
+            out = df.rename(columns=str.lower)[keep].astype({"volume": "int64"}, errors="ignore")
             return out
         except Exception as e:
             last_err = e
@@ -47,27 +58,86 @@ def fetch_with_yfinance_strict(ticker: str, start: str, end: str, max_retries: i
 
 def fetch_one(ticker: str, start: str, end: str) -> pd.DataFrame:
     df = fetch_with_yfinance_strict(ticker, start, end)
-    df = df.copy()
-    df["symbol"] = ticker
-    df["date"] = df.index.strftime(DATE_FORMAT)
+    # 严格截取区间（右开），直接在 DatetimeIndex 上切片
+    tz = df.index.tz
+    start_dt = pd.Timestamp(START_DATE, tz=tz)
+    end_dt = pd.Timestamp(END_DATE, tz=tz) - pd.Timedelta(days=1)
+    df = df.loc[start_dt:end_dt]
+    df = df.assign(symbol=ticker, date=df.index.strftime(DATE_FORMAT))
     df = df[["symbol", "date", "open", "close", "high", "low", "volume"]]
-    # 严格截取区间（右开）
-    start_dt = datetime.strptime(START_DATE, "%Y-%m-%d")
-    end_dt = datetime.strptime(END_DATE, "%Y-%m-%d")
-    df = df[(pd.to_datetime(df["date"]) >= start_dt) & (pd.to_datetime(df["date"]) < end_dt)]
     df = df.dropna()
     return df
 
+def cached_row_count(path: str, start: str, end: str) -> Optional[int]:
+    """
+    如果 path 存在、未超过 CACHE_TTL_SECONDS 且覆盖 [start, end)，返回其行数；否则返回 None
+    只解析 date 一列，不读取价格数据
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if time.time() - st.st_mtime >= CACHE_TTL_SECONDS:
+        return None
+
+    dates = pd.read_csv(path, usecols=["date"])["date"]
+    if dates.empty:
+        return None
+    first = pd.Timestamp(dates.iloc[0])
+    last = pd.Timestamp(dates.iloc[-1])
+    start_dt = pd.Timestamp(start)
+    end_dt = pd.Timestamp(end)
+    if not (start_dt <= first < start_dt + CACHE_EDGE_SLACK):
+        return None
+    if not (end_dt - CACHE_EDGE_SLACK <= last < end_dt):
+        return None
+    return len(dates)
+
 def main():
     os.makedirs("data", exist_ok=True)
     all_rows = 0
+    # 本地缓存仍然有效的 ticker 直接跳过网络请求
+    to_fetch = []
     for t in TICKERS:
-        df = fetch_one(t, START_DATE, END_DATE)
         out_path = f"data/{t}.csv"
-        df.to_csv(out_path, index=False)
+        n_rows = cached_row_count(out_path, START_DATE, END_DATE)
+        if n_rows is None:
+            to_fetch.append(t)
+            continue
+        all_rows += n_rows
+        print(f"[CACHED] {t}: {n_rows} rows <- {out_path}")
+
+    # 网络请求并发执行，CSV 在主线程写出
+    # 单个 ticker 失败不影响其他 ticker 写文件，最后再抛出异常
+    results = {}
+    errors = {}
+    if to_fetch:
+        with ThreadPoolExecutor(max_workers=len(to_fetch)) as pool:
+            futures = {pool.submit(fetch_one, t, START_DATE, END_DATE): t for t in to_fetch}
+            for fut in as_completed(futures):
+                t = futures[fut]
+                try:
+                    results[t] = fut.result()
+                except Exception as e:
+                    errors[t] = e
+    for t in to_fetch:
+        if t in errors:
+            print(f"[FAIL] {t}: {errors[t]}")
+            continue
+        df = results[t]
+        out_path = f"data/{t}.csv"
+        # Polars 的 CSV writer 是原生实现，比 pandas to_csv 快；输出格式一致
+        pl.from_pandas(df).write_csv(out_path)
+        # 同时写一份 Parquet（date 存为时间类型），分析脚本优先读取它
+        parquet_path = out_path.replace(".csv", ".parquet")
+        df.assign(date=pd.to_datetime(df["date"])).to_parquet(
+            parquet_path, index=False, compression="snappy"
+        )
         all_rows += len(df)
         print(f"[OK] {t}: {len(df)} rows -> {out_path}")
     print(f"Done. Total rows: {all_rows}")
+    if errors:
+        raise errors[next(t for t in to_fetch if t in errors)]
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,13 @@
+import functools
 import os
 from typing import Dict
 
+import bottleneck as bn
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pa_parquet
 import matplotlib.pyplot as plt
 
 # ==========================
@@ -22,37 +27,82 @@ END_DATE = "2024-01-01"
 SHORT_MA = 50
 LONG_MA = 200
 
+# CSV 各列的类型，交给 Arrow 解析器一次性转换
+# volume 用 float64：写成 "234684800.0" 的成交量也能读（和以前 pd.to_numeric 的效果一样）
+PRICE_COLUMN_TYPES = {
+    "date": pa.timestamp("s"),
+    "open": pa.float64(),
+    "high": pa.float64(),
+    "low": pa.float64(),
+    "close": pa.float64(),
+    "adj_close": pa.float64(),
+    "volume": pa.float64(),
+}
+
 
 # ==========================
 # 工具函数
 # ==========================
 
+def _arrow_numeric_dtype(arrow_type: pa.DataType):
+    """
+    数值列映射为 pandas ArrowDtype，其他列（日期、symbol）用默认类型
+    """
+    if pa.types.is_floating(arrow_type) or pa.types.is_integer(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
 def load_price(symbol: str) -> pd.DataFrame:
     """
-    从 task-3/data/{symbol}.csv 读取价格数据。
+    从 task-3/data/{symbol}.parquet 读取价格数据，没有（或比 CSV 旧）则读 {symbol}.csv。
     你的 CSV 列结构是：
       symbol, date, open, high, low, close, adj_close, volume
     这里统一处理为：
       - index: date (datetime)
-      - 列: open, high, low, close, adj_close, volume （float）
+      - 列: open, high, low, close, adj_close, volume （float64[pyarrow]）
+    结果按 (文件路径, 修改时间) 缓存：文件没变就不重新解析（在 notebook 里反复运行很有用）。
+    返回的是缓存里的同一个 DataFrame，调用方不要原地修改（add_technical_columns 会先 copy）。
     """
     path = os.path.join(DATA_DIR, f"{symbol}.csv")
-    if not os.path.exists(path):
+    parquet_path = os.path.join(DATA_DIR, f"{symbol}.parquet")
+
+    # Parquet 比 CSV 旧（例如 git pull 更新了 CSV）就说明过期了，改读 CSV
+    if os.path.exists(parquet_path) and (
+        not os.path.exists(path) or os.path.getmtime(parquet_path) >= os.path.getmtime(path)
+    ):
+        path = parquet_path
+    elif not os.path.exists(path):
         raise FileNotFoundError(f"CSV not found: {path}")
 
-    df = pd.read_csv(path)
+    return _load_price_cached(path, os.path.getmtime(path))
 
-    # 处理日期列
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.set_index("date")
-    df = df.sort_index()
 
-    # 只保留我们需要的数值列，并强制转成数值，防止出现字符串
-    numeric_cols = ["open", "high", "low", "close", "adj_close", "volume"]
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+@functools.lru_cache(maxsize=32)
+def _load_price_cached(path: str, mtime: float) -> pd.DataFrame:
+    """
+    load_price 的实际读取逻辑；mtime 只作为缓存 key 的一部分，文件更新后自动失效
+    """
+    if path.endswith(".parquet"):
+        # fetch_faang.py 写出的 Parquet 已经带类型（date 为时间类型），不用再解析
+        table = pa_parquet.read_table(path)
+    else:
+        # yfinance 多级列名会在表头下面多写一行 ",,AAPL,AAPL,..."，读取时跳过
+        with open(path, encoding="utf-8") as f:
+            f.readline()
+            extra_header_rows = 1 if f.readline().startswith(",") else 0
+
+        # Arrow CSV 解析器按 PRICE_COLUMN_TYPES 一次完成类型转换，数值列保持 Arrow 存储
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(skip_rows_after_names=extra_header_rows),
+            convert_options=pa_csv.ConvertOptions(column_types=PRICE_COLUMN_TYPES),
+        )
+
+    df = table.to_pandas(types_mapper=_arrow_numeric_dtype)
+    df = df.set_index("date").sort_index()
 
+    numeric_cols = ["open", "high", "low", "close", "adj_close", "volume"]
     df = df[numeric_cols].dropna(subset=["close"])
 
     # 按日期范围裁剪一下（防止有多余数据）
@@ -69,10 +119,14 @@ def add_technical_columns(df: pd.DataFrame) -> pd.DataFrame:
       - log_return
     """
     df = df.copy()
-    df["MA50"] = df["close"].rolling(SHORT_MA).mean()
-    df["MA200"] = df["close"].rolling(LONG_MA).mean()
-    df["daily_return"] = df["close"].pct_change()
-    df["log_return"] = np.log(df["close"]).diff()
+    closes = df["close"].to_numpy(dtype=np.float64)
+    df["MA50"] = bn.move_mean(closes, SHORT_MA, min_count=SHORT_MA)
+    df["MA200"] = bn.move_mean(closes, LONG_MA, min_count=LONG_MA)
+    daily_return = np.full(closes.shape, np.nan)
+    daily_return[1:] = closes[1:] / closes[:-1] - 1.0
+    df["daily_return"] = daily_return
+    # log(p_t / p_{t-1}) = log1p(daily_return)，复用上面的结果，少算一遍 log
+    df["log_return"] = np.log1p(daily_return)
     return df
 
 
@@ -80,23 +134,21 @@ def add_technical_columns(df: pd.DataFrame) -> pd.DataFrame:
 # 绘图函数
 # ==========================
 
-def plot_price_with_ma(symbol: str, df: pd.DataFrame):
+def plot_price_with_ma(symbol: str, df: pd.DataFrame, ax: plt.Axes):
     """
-    绘制价格 + 均线图
+    在给定的 ax 上绘制价格 + 均线图
     """
-    plt.figure(figsize=(10, 4))
-    plt.plot(df.index, df["close"], label=f"{symbol} Close", linewidth=1)
+    ax.plot(df.index, df["close"], label=f"{symbol} Close", linewidth=1)
     if "MA50" in df.columns:
-        plt.plot(df.index, df["MA50"], label="MA 50", linewidth=1)
+        ax.plot(df.index, df["MA50"], label="MA 50", linewidth=1)
     if "MA200" in df.columns:
-        plt.plot(df.index, df["MA200"], label="MA 200", linewidth=1)
+        ax.plot(df.index, df["MA200"], label="MA 200", linewidth=1)
 
-    plt.title(f"{symbol} Price with {SHORT_MA}/{LONG_MA}-Day Moving Averages")
-    plt.xlabel("Date")
-    plt.ylabel("Price")
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
+    ax.set_title(f"{symbol} Price with {SHORT_MA}/{LONG_MA}-Day Moving Averages")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Price")
+    ax.legend()
+    ax.grid(True)
 
 
 def plot_correlation_heatmap(corr: pd.DataFrame):
@@ -155,19 +207,28 @@ def main():
     benchmark_df = add_technical_columns(benchmark_df)
     print(f"{BENCHMARK} loaded: {len(benchmark_df)} rows, {benchmark_df.index.min().date()} → {benchmark_df.index.max().date()}")
 
-    # 3. 每只股票画一个 价格+MA 图
-    for sym, df in stock_dfs.items():
-        plot_price_with_ma(sym, df)
+    # 3. 每只股票画一个 价格+MA 子图，共用一个 Figure
+    fig, axes = plt.subplots(
+        len(stock_dfs), 1, figsize=(10, 4 * len(stock_dfs)), sharex=True, squeeze=False
+    )
+    for (sym, df), ax in zip(stock_dfs.items(), axes[:, 0]):
+        plot_price_with_ma(sym, df, ax)
+    fig.tight_layout()
 
     # 4. 计算周收益率相关性（FAANG + SPY）
-    weekly_returns = {}
-    for sym, df in stock_dfs.items():
-        weekly_returns[sym] = df["close"].resample("W").last().pct_change()
-
-    weekly_returns[BENCHMARK] = benchmark_df["close"].resample("W").last().pct_change()
-
-    weekly_ret_df = pd.DataFrame(weekly_returns).dropna(how="any")
-    corr = weekly_ret_df.corr()
+    #    先把所有收盘价拼成一张宽表，只做一次 resample
+    closes = {sym: df["close"] for sym, df in stock_dfs.items()}
+    closes[BENCHMARK] = benchmark_df["close"]
+    wide = pd.concat(closes, axis=1)
+
+    weekly_ret_df = wide.resample("W").last().pct_change().dropna(how="any")
+    # dropna 之后没有缺失值，直接在 NumPy 数组上算相关系数矩阵
+    vals = weekly_ret_df.to_numpy(dtype=np.float64, copy=False)
+    corr = pd.DataFrame(
+        np.corrcoef(vals, rowvar=False),
+        index=weekly_ret_df.columns,
+        columns=weekly_ret_df.columns,
+    )
     print("\nWeekly return correlation matrix:")
     print(corr)
 
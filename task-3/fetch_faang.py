@@ -1,6 +1,13 @@
 import os
+import time
+from typing import List, Optional
+
 import pandas as pd
+import polars as pl
+import requests
 import yfinance as yf
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # ------------ 配置 ------------
 START_DATE = "2014-01-01"
@@ -9,6 +16,21 @@ END_DATE = "2024-01-01"
 # 5只股票 + SP500（这里用 SPY 作为指数代理）
 TICKERS = ["AAPL", "AMZN", "GOOG", "META", "MSFT", "SPY"]
 
+# 本地 CSV 在该时间内视为有效，不再重复下载（历史日线不会变）
+CACHE_TTL_SECONDS = 24 * 60 * 60
+# 首/末交易日与区间端点允许的最大间隔（周末 + 节假日）
+CACHE_EDGE_SLACK = pd.Timedelta(days=7)
+
+# 所有下载共用一个 Session（连接池复用），yfinance 内部多线程时也只建一组连接
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
 
 def get_data_dir() -> str:
     """
@@ -21,21 +43,38 @@ def get_data_dir() -> str:
     return data_dir
 
 
-def fetch_one(ticker: str, start: str, end: str) -> pd.DataFrame:
+def download_batch(tickers: List[str], start: str, end: str) -> pd.DataFrame:
     """
-    用 yfinance 下载一只股票的日线数据，并整理成统一格式的 DataFrame
+    一次 yf.download 批量下载多只股票的日线数据
+    返回的列是两层：第一层 ticker，第二层 Open/High/Low/Close/Adj Close/Volume
     """
-    df = yf.download(
-        ticker,
+    big = yf.download(
+        tickers,
         start=start,
         end=end,
+        group_by="ticker",
         auto_adjust=False,
         progress=False,
+        threads=True,  # yfinance 内部并发请求各个 ticker
+        session=SESSION,
     )
 
-    if df is None or df.empty:
+    if big is None or big.empty:
+        raise RuntimeError(f"Download failed for {', '.join(tickers)}")
+
+    return big
+
+
+def format_one(big: pd.DataFrame, ticker: str) -> pd.DataFrame:
+    """
+    从批量下载结果中取出一只股票，并整理成统一格式的 DataFrame
+    """
+    if ticker not in big.columns.get_level_values(0):
         raise RuntimeError(f"Download failed for {ticker}")
 
+    # 取出这只股票的单层列
+    df = big[ticker].rename_axis(columns=None)
+
     # 统一列名
     df = df.rename(
         columns={
@@ -50,31 +89,100 @@ def fetch_one(ticker: str, start: str, end: str) -> pd.DataFrame:
 
     # 去掉时区信息，重置索引
     df.index = df.index.tz_localize(None)
-    df.reset_index(inplace=True)
+    df = df.reset_index()
 
     # 日期统一为字符串 yyyy-mm-dd
     df["date"] = pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d")
     df["symbol"] = ticker
 
-    # 挑选列并去掉缺失
+    # 挑选列并去掉缺失（批量下载时某只股票缺的交易日会是 NaN 行）
     df = df[["symbol", "date", "open", "high", "low", "close", "adj_close", "volume"]]
     df = df.dropna()
 
+    if df.empty:
+        raise RuntimeError(f"Download failed for {ticker}")
+
+    # 批量结果按所有 ticker 的日期对齐，缺失日是 NaN，volume 会变成 float；
+    # dropna 之后转回 int64，保持 CSV / Parquet 里成交量是整数
+    df = df.astype({"volume": "int64"})
+
     return df
 
 
+def cached_row_count(path: str, start: str, end: str) -> Optional[int]:
+    """
+    如果 path 存在、未超过 CACHE_TTL_SECONDS 且覆盖 [start, end)，返回其行数；否则返回 None
+    只解析 date 一列，不读取价格数据
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if time.time() - st.st_mtime >= CACHE_TTL_SECONDS:
+        return None
+
+    # dropna 去掉没有日期的行（旧版 FAANG CSV 表头下面多出来的 ",,AAPL,..." 那一行）
+    dates = pd.read_csv(path, usecols=["date"])["date"].dropna()
+    if dates.empty:
+        return None
+    first = pd.Timestamp(dates.iloc[0])
+    last = pd.Timestamp(dates.iloc[-1])
+    start_dt = pd.Timestamp(start)
+    end_dt = pd.Timestamp(end)
+    if not (start_dt <= first < start_dt + CACHE_EDGE_SLACK):
+        return None
+    if not (end_dt - CACHE_EDGE_SLACK <= last < end_dt):
+        return None
+    return len(dates)
+
+
 def main():
     data_dir = get_data_dir()
     total_rows = 0
 
+    # 本地缓存仍然有效的股票直接跳过网络请求
+    to_fetch = []
     for t in TICKERS:
-        df = fetch_one(t, START_DATE, END_DATE)
         out_path = os.path.join(data_dir, f"{t}.csv")
-        df.to_csv(out_path, index=False)
+        n_rows = cached_row_count(out_path, START_DATE, END_DATE)
+        if n_rows is None:
+            to_fetch.append(t)
+            continue
+        print(f"[CACHED] {t}: {n_rows} rows <- {out_path}")
+        total_rows += n_rows
+
+    # 所有需要更新的股票合并成一次批量请求
+    #    某只股票在批量结果里缺失时不影响其他股票写文件，最后再抛出异常
+    results = {}
+    errors = {}
+    if to_fetch:
+        big = download_batch(to_fetch, START_DATE, END_DATE)
+        for t in to_fetch:
+            try:
+                results[t] = format_one(big, t)
+            except RuntimeError as e:
+                errors[t] = e
+
+    # 写文件留在主线程
+    for t in to_fetch:
+        if t in errors:
+            print(f"[FAIL] {t}: {errors[t]}")
+            continue
+        df = results[t]
+        out_path = os.path.join(data_dir, f"{t}.csv")
+        # Polars 的 CSV writer 是原生实现，比 pandas to_csv 快；输出格式一致
+        pl.from_pandas(df).write_csv(out_path)
+        # 同时写一份 Parquet（date 存为时间类型），分析脚本优先读取它
+        parquet_path = out_path.replace(".csv", ".parquet")
+        df.assign(date=pd.to_datetime(df["date"])).to_parquet(
+            parquet_path, index=False, compression="snappy"
+        )
         print(f"[OK] {t}: {len(df)} rows -> {out_path}")
         total_rows += len(df)
 
     print(f"Done. Total rows: {total_rows}")
+    if errors:
+        raise errors[next(t for t in to_fetch if t in errors)]
 
 
 if __name__ == "__main__":
@@ -1,6 +1,12 @@
 import pandas as pd
 import numpy as np
+import bottleneck as bn
+import numexpr as ne
 import os
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pa_parquet
+from numba import njit
 
 # -----------------------------
 # Paths & constants
@@ -13,30 +19,62 @@ START_DATE = "2015-01-01"
 END_DATE = "2024-01-01"
 RISK_FREE = 0.0  # rf = 0 as in previous project
 
+# Column types handed to the Arrow CSV parser (missing columns are ignored).
+# volume is float64 so values written as "234684800.0" still load.
+PRICE_COLUMN_TYPES = {
+    "date": pa.timestamp("s"),
+    "open": pa.float64(),
+    "high": pa.float64(),
+    "low": pa.float64(),
+    "close": pa.float64(),
+    "adj_close": pa.float64(),
+    "volume": pa.float64(),
+}
+
 
 # -----------------------------
 # Helpers
 # -----------------------------
+def _arrow_numeric_dtype(arrow_type: pa.DataType):
+    """
+    Map numeric Arrow columns to pandas ArrowDtype; keep defaults for the rest.
+    """
+    if pa.types.is_floating(arrow_type) or pa.types.is_integer(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
 def load_price_csv(path: str) -> pd.DataFrame:
     """
     Load a price CSV and return a numeric DataFrame indexed by date.
+    A Parquet file with the same name next to the CSV is read instead if present
+    and not older than the CSV.
     This works for both QQQ (task-2) and FAANG (task-3) files.
     """
-    df = pd.read_csv(path)
-
-    # If we have a "date" column, use it as index
-    if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"])
-        df = df.set_index("date")
-
-    # Ensure index is datetime
-    if not isinstance(df.index, pd.DatetimeIndex):
-        df.index = pd.to_datetime(df.index)
-
-    # Force numeric for standard OHLCV columns
-    for col in ["open", "high", "low", "close", "adj_close", "volume"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    parquet_path = os.path.splitext(path)[0] + ".parquet"
+    # A Parquet file older than the CSV is stale (e.g. the CSV came from git pull).
+    use_parquet = os.path.exists(parquet_path) and (
+        not os.path.exists(path) or os.path.getmtime(parquet_path) >= os.path.getmtime(path)
+    )
+    if use_parquet:
+        # Written by the fetch scripts next to the CSV; already typed.
+        table = pa_parquet.read_table(parquet_path)
+    else:
+        # FAANG files carry a second header line (",,AAPL,AAPL,...") left over
+        # from yfinance's multi-level columns; skip it when present.
+        with open(path, encoding="utf-8") as f:
+            f.readline()
+            extra_header_rows = 1 if f.readline().startswith(",") else 0
+
+        # Arrow parses and types every column in one pass; numeric columns
+        # stay Arrow-backed, so no per-column pd.to_numeric is needed.
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(skip_rows_after_names=extra_header_rows),
+            convert_options=pa_csv.ConvertOptions(column_types=PRICE_COLUMN_TYPES),
+        )
+    df = table.to_pandas(types_mapper=_arrow_numeric_dtype)
+    df = df.set_index("date")
 
     # Sort index and clip by date range using boolean masks
     df = df.sort_index()
@@ -55,10 +93,13 @@ def add_ma(df: pd.DataFrame, windows=(50, 200)) -> pd.DataFrame:
         raise ValueError("Expected a 'close' column in price DataFrame.")
 
     df = df.copy()
-    df["close"] = pd.to_numeric(df["close"], errors="coerce")
+    # Plain float64 so comparisons against the (NaN-padded) MA yield False,
+    # not <NA>, during the warm-up window.
+    df["close"] = df["close"].astype(np.float64)
 
+    closes = df["close"].to_numpy()
     for w in windows:
-        df[f"ma{w}"] = df["close"].rolling(w).mean()
+        df[f"ma{w}"] = bn.move_mean(closes, w, min_count=w)
 
     return df
 
@@ -74,27 +115,57 @@ def compute_strategy_returns(price: pd.Series, signal: pd.Series) -> pd.Series:
     return strat_ret
 
 
+@njit(cache=True)
+def _performance_kernel(returns, initial_capital):
+    """
+    Single pass over daily returns:
+    equity curve -> running max -> max drawdown, plus running mean / variance
+    (Welford) of the returns.
+    Returns (final_equity, max_drawdown, mean, std) with std using ddof=1.
+    Same kernel as qqq_analysis.py (standalone scripts).
+    """
+    equity = initial_capital
+    max_equity = initial_capital
+    max_dd = 0.0
+    mean = 0.0
+    m2 = 0.0
+    n = 0
+
+    for r in returns:
+        equity *= 1.0 + r
+        if equity > max_equity:
+            max_equity = equity
+        dd = equity / max_equity - 1.0
+        if dd < max_dd:
+            max_dd = dd
+
+        n += 1
+        delta = r - mean
+        mean += delta / n
+        m2 += delta * (r - mean)
+
+    std = np.sqrt(m2 / (n - 1)) if n > 1 else np.nan
+    return equity, max_dd, mean, std
+
+
 def summarize_performance(daily_ret: pd.Series, name: str):
     """
     Print performance statistics for a daily return series:
     final equity (starting from 100k), total return, max drawdown, volatility, Sharpe.
     """
     initial_equity = 100_000.0
-    equity = (1 + daily_ret).cumprod() * initial_equity
-
-    total_return = equity.iloc[-1] / initial_equity - 1.0
+    final_equity, max_dd, mean_ret, std_ret = _performance_kernel(
+        daily_ret.to_numpy(dtype=np.float64), initial_equity
+    )
 
-    # Max drawdown
-    roll_max = equity.cummax()
-    drawdown = equity / roll_max - 1.0
-    max_dd = drawdown.min()
+    total_return = final_equity / initial_equity - 1.0
 
     # Annualized volatility & Sharpe (rf = 0)
-    vol_ann = daily_ret.std() * np.sqrt(252)
-    sharpe = (daily_ret.mean() / daily_ret.std()) * np.sqrt(252) if daily_ret.std() > 0 else np.nan
+    vol_ann = std_ret * np.sqrt(252)
+    sharpe = (mean_ret / std_ret) * np.sqrt(252) if std_ret > 0 else np.nan
 
     print(f"\n=== {name} ===")
-    print(f"Final equity:\t\t{equity.iloc[-1]:,.2f} USD")
+    print(f"Final equity:\t\t{final_equity:,.2f} USD")
     print(f"Total return:\t\t{total_return*100:.2f}%")
     print(f"Max drawdown:\t\t{max_dd*100:.2f}%")
     print(f"Volatility (ann.):\t{vol_ann*100:.2f}%")
@@ -109,33 +180,43 @@ def build_baseline_momentum_signal(qqq_with_ma: pd.DataFrame) -> pd.Series:
     Baseline momentum strategy:
     - Invest in QQQ when close > MA(50), otherwise stay in cash.
     """
-    signal = (qqq_with_ma["close"] > qqq_with_ma["ma50"]).astype(int)
+    signal = (qqq_with_ma["close"] > qqq_with_ma["ma50"]).astype(np.int8)
     signal.name = "baseline_ma50"
     return signal
 
 
-def build_faang_risk_on_signal() -> pd.Series:
+def build_faang_risk_on_signal(index: pd.DatetimeIndex) -> pd.Series:
     """
-    Build a FAANG-based 'risk-on' signal:
+    Build a FAANG-based 'risk-on' signal aligned to the given (QQQ) dates:
     - For each FAANG stock, compute 200-day MA.
     - For each day, check how many FAANG names are above their MA(200).
     - Risk-on = 1 if at least 3 out of 5 are above MA(200).
+    Days a stock has no data (or no full MA window yet) count as 'below'.
     """
-    risk_flags = []
+    window = 200
+    dates = index.to_numpy()
 
-    for sym in FAANG_TICKERS:
+    # One int8 column per ticker instead of a float64 frame from pd.concat
+    flags = np.zeros((len(index), len(FAANG_TICKERS)), dtype=np.int8)
+
+    for i, sym in enumerate(FAANG_TICKERS):
         path = os.path.join(FAANG_DIR, f"{sym}.csv")
         df = load_price_csv(path)
-        df = add_ma(df, windows=(200,))
 
-        above_ma = (df["close"] > df["ma200"]).astype(int)
-        above_ma.name = sym
-        risk_flags.append(above_ma)
+        close = df["close"].to_numpy(dtype=np.float64)
+        ma200 = bn.move_mean(close, window, min_count=window)
+        above_ma = close > ma200
 
-    combo = pd.concat(risk_flags, axis=1).fillna(0)
-    count_above = combo.sum(axis=1)
+        # Align to the target dates: exact date matches only
+        sym_dates = df.index.to_numpy()
+        pos = np.searchsorted(sym_dates, dates)
+        pos = np.minimum(pos, len(sym_dates) - 1)
+        matched = sym_dates[pos] == dates
+        flags[matched, i] = above_ma[pos[matched]]
 
-    risk_on = (count_above >= 3).astype(int)
+    # At most 5 names above MA, so the count fits in int8 as well
+    count_above = flags.sum(axis=1, dtype=np.int8)
+    risk_on = pd.Series((count_above >= 3).astype(np.int8), index=index, dtype="int8")
     risk_on.name = "risk_on_faang"
 
     return risk_on
@@ -152,14 +233,22 @@ def main():
     summarize_performance(baseline_ret, name="Baseline QQQ MA(50) Momentum")
 
     # 3) FAANG risk-on signal based on MA(200)
-    risk_on = build_faang_risk_on_signal()
-    risk_on = risk_on.reindex(qqq.index).fillna(0)
+    risk_on = build_faang_risk_on_signal(qqq.index)
 
     # 4) TA-enhanced strategy:
     #    Invest in QQQ only when:
     #    - QQQ > MA(50), AND
     #    - FAANG risk-on == 1
-    ta_signal = ((qqq["close"] > qqq["ma50"]) & (risk_on == 1)).astype(int)
+    #    numexpr evaluates both comparisons and the AND in one fused loop
+    ta_mask = ne.evaluate(
+        "(close > ma50) & (risk_on == 1)",
+        local_dict={
+            "close": qqq["close"].to_numpy(dtype=np.float64),
+            "ma50": qqq["ma50"].to_numpy(dtype=np.float64),
+            "risk_on": risk_on.to_numpy(),
+        },
+    )
+    ta_signal = pd.Series(ta_mask.astype(np.int8), index=qqq.index)
     ta_signal.name = "ma50_plus_faang_filter"
 
     strat_ret_ta = compute_strategy_returns(qqq["close"], ta_signal)